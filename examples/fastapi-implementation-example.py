@@ -89,7 +89,7 @@ def validate_shopify_sso_token(token: str) -> Optional[Dict]:
 # 2. Callback Route (app/routes/auth/shopify_callback.py)
 # ============================================================================
 
-from fastapi import APIRouter, Request, Response, Query, HTTPException
+from fastapi import APIRouter, Depends, Request, Response, Query, HTTPException
 from fastapi.responses import RedirectResponse
 from utils.shopify_sso import validate_shopify_sso_token
 from utils.auth import create_user_session, create_or_update_user
@@ -103,6 +103,7 @@ async def shopify_callback(
     request: Request,
     token: str = Query(..., description="SSO token from Shopify"),
     return_to: str = Query("/", description="Return URL after authentication"),
+    db = Depends(get_db),
 ):
     """Handle SSO callback from Shopify"""
     if not token:
@@ -113,8 +114,6 @@ async def shopify_callback(
     if not customer_data:
         return RedirectResponse(url=f"/login?error=invalid_token")
 
-    db = next(get_db())
-    
     # Create or update user in database
     user = create_or_update_user(
         db=db,
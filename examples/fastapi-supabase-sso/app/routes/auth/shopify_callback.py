@@ -2,6 +2,7 @@
 SSO Callback Route - Handles authentication from Shopify
 """
 
+import asyncio
 from fastapi import APIRouter, Query, HTTPException
 from fastapi.responses import RedirectResponse
 from utils.shopify_sso import validate_shopify_sso_token
@@ -9,6 +10,12 @@ from utils.auth import create_user_session, create_or_update_user
 
 router = APIRouter()
 
+# Login redirect targets for each failure mode
+LOGIN_ERROR_MISSING_TOKEN = "/login?error=missing_token"
+LOGIN_ERROR_INVALID_TOKEN = "/login?error=invalid_token"
+LOGIN_ERROR_USER_CREATION_FAILED = "/login?error=user_creation_failed"
+LOGIN_ERROR_AUTHENTICATION_FAILED = "/login?error=authentication_failed"
+
 
 @router.get("/auth/shopify-callback")
 async def shopify_callback(
@@ -26,13 +33,13 @@ async def shopify_callback(
     5. Set session cookie and redirect
     """
     if not token:
-        return RedirectResponse(url=f"/login?error=missing_token")
+        return RedirectResponse(url=LOGIN_ERROR_MISSING_TOKEN)
 
-    # Validate token
-    customer_data = validate_shopify_sso_token(token)
+    # Validate token off the event loop; the crypto work is CPU-bound
+    customer_data = await asyncio.to_thread(validate_shopify_sso_token, token)
 
     if not customer_data:
-        return RedirectResponse(url=f"/login?error=invalid_token")
+        return RedirectResponse(url=LOGIN_ERROR_INVALID_TOKEN)
 
     try:
         # Create or update user in database
@@ -45,7 +52,7 @@ async def shopify_callback(
         )
 
         if not user or not user.get("id"):
-            return RedirectResponse(url=f"/login?error=user_creation_failed")
+            return RedirectResponse(url=LOGIN_ERROR_USER_CREATION_FAILED)
 
         # Create session
         session_token = create_user_session(user["id"])
@@ -66,4 +73,4 @@ async def shopify_callback(
         
     except Exception as e:
         print(f"Error in shopify_callback: {e}")
-        return RedirectResponse(url=f"/login?error=authentication_failed")
+        return RedirectResponse(url=LOGIN_ERROR_AUTHENTICATION_FAILED)
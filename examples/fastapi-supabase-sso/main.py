@@ -2,14 +2,28 @@
 FastAPI Main Application
 """
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes.auth import shopify_callback
+from utils.database import close_connections, warm_supabase_connection
+from utils.shopify_sso import check_aes_ni_support
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run startup checks and manage pooled connections"""
+    check_aes_ni_support()
+    warm_supabase_connection()
+    yield
+    close_connections()
+
 
 app = FastAPI(
     title="XWAN.AI SSO API",
     description="SSO authentication API for Shopify integration",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -1,7 +1,10 @@
 -- Supabase Database Schema for SSO
 -- Run this in your Supabase SQL Editor
 
+-- Sessions are stored in Redis (see utils/auth.py), not in Postgres
+
 -- Users table
+-- email must stay UNIQUE: create_or_update_user upserts on it
 CREATE TABLE IF NOT EXISTS users (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     email VARCHAR(255) UNIQUE NOT NULL,
@@ -12,19 +15,7 @@ CREATE TABLE IF NOT EXISTS users (
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
--- Sessions table
-CREATE TABLE IF NOT EXISTS sessions (
-    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-    token VARCHAR(255) UNIQUE NOT NULL,
-    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-);
-
 -- Indexes for performance
-CREATE INDEX IF NOT EXISTS idx_sessions_token ON sessions(token);
-CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id);
-CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at);
 CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 CREATE INDEX IF NOT EXISTS idx_users_shopify_customer_id ON users(shopify_customer_id);
 
@@ -43,15 +34,9 @@ CREATE TRIGGER update_users_updated_at BEFORE UPDATE ON users
 
 -- Enable Row Level Security (RLS)
 ALTER TABLE users ENABLE ROW LEVEL SECURITY;
-ALTER TABLE sessions ENABLE ROW LEVEL SECURITY;
 
 -- Policy: Service role can do everything (for backend operations)
 CREATE POLICY "Service role full access" ON users
     FOR ALL
     USING (true)
     WITH CHECK (true);
-
-CREATE POLICY "Service role full access" ON sessions
-    FOR ALL
-    USING (true)
-    WITH CHECK (true);
@@ -3,10 +3,25 @@ Authentication utilities for user and session management
 """
 
 import secrets
-from datetime import datetime, timedelta
+import threading
+from datetime import datetime
 from typing import Optional
+from cachetools import TTLCache
 from supabase import Client
-from utils.database import get_supabase
+from utils.database import get_redis, get_supabase
+
+SESSION_TTL_SECONDS = 60 * 60 * 24 * 7  # 7 days
+SESSION_TOKEN_BYTES = 24  # 192 bits of entropy, 32 URL-safe characters
+
+# Short-lived in-process cache of user rows by ID, so bursts of requests
+# from the same session don't each hit Supabase
+_user_cache: TTLCache = TTLCache(maxsize=10000, ttl=30)
+_user_cache_lock = threading.Lock()
+
+
+def _session_key(session_token: str) -> str:
+    """Redis key for a session token"""
+    return f"session:{session_token}"
 
 
 def create_or_update_user(
@@ -29,9 +44,9 @@ def create_or_update_user(
     """
     supabase = get_supabase()
     
-    # Check if user exists
-    existing_user = supabase.table("users").select("*").eq("email", email).execute()
-    
+    # Insert or update in a single round trip; relies on the UNIQUE
+    # constraint on users.email. created_at is left to the column default
+    # so it is only set when the row is first inserted.
     user_data = {
         "email": email,
         "first_name": first_name,
@@ -40,21 +55,20 @@ def create_or_update_user(
         "updated_at": datetime.utcnow().isoformat(),
     }
     
-    if existing_user.data and len(existing_user.data) > 0:
-        # Update existing user
-        user = existing_user.data[0]
-        result = (
-            supabase.table("users")
-            .update(user_data)
-            .eq("id", user["id"])
-            .execute()
-        )
-        return result.data[0] if result.data else user
-    else:
-        # Create new user
-        user_data["created_at"] = datetime.utcnow().isoformat()
-        result = supabase.table("users").insert(user_data).execute()
-        return result.data[0] if result.data else None
+    result = (
+        supabase.table("users")
+        .upsert(user_data, on_conflict="email")
+        .execute()
+    )
+    
+    if not result.data:
+        return None
+    
+    # Replace any cached copy so sessions see the updated profile
+    user = result.data[0]
+    with _user_cache_lock:
+        _user_cache[user["id"]] = user
+    return user
 
 
 def create_user_session(user_id: str) -> str:
@@ -67,25 +81,46 @@ def create_user_session(user_id: str) -> str:
     Returns:
         Session token
     """
-    supabase = get_supabase()
-    
     # Generate session token
-    session_token = secrets.token_urlsafe(32)
+    session_token = secrets.token_urlsafe(SESSION_TOKEN_BYTES)
     
-    # Calculate expiry (7 days from now)
-    expires_at = (datetime.utcnow() + timedelta(days=7)).isoformat()
+    # Store session in Redis; the TTL expires it after 7 days
+    get_redis().setex(_session_key(session_token), SESSION_TTL_SECONDS, user_id)
     
-    # Store session in database
-    session_data = {
-        "token": session_token,
-        "user_id": user_id,
-        "expires_at": expires_at,
-        "created_at": datetime.utcnow().isoformat(),
-    }
+    return session_token
+
+
+def _get_user_by_id(user_id: str) -> Optional[dict]:
+    """
+    Get user row by ID, served from the in-process cache when fresh
     
-    supabase.table("sessions").insert(session_data).execute()
+    Args:
+        user_id: User ID from database
+        
+    Returns:
+        User dictionary if found, None otherwise
+    """
+    with _user_cache_lock:
+        user = _user_cache.get(user_id)
+    if user is not None:
+        return user
     
-    return session_token
+    supabase = get_supabase()
+    
+    user_result = (
+        supabase.table("users")
+        .select("*")
+        .eq("id", user_id)
+        .execute()
+    )
+    
+    if not user_result.data:
+        return None
+    
+    user = user_result.data[0]
+    with _user_cache_lock:
+        _user_cache[user_id] = user
+    return user
 
 
 def get_user_from_session(session_token: str) -> Optional[dict]:
@@ -101,38 +136,14 @@ def get_user_from_session(session_token: str) -> Optional[dict]:
     if not session_token:
         return None
     
-    supabase = get_supabase()
-    
     try:
-        # Get session
-        session_result = (
-            supabase.table("sessions")
-            .select("*, users(*)")
-            .eq("token", session_token)
-            .gt("expires_at", datetime.utcnow().isoformat())
-            .execute()
-        )
+        # Expired sessions have already been evicted by their TTL
+        user_id = get_redis().get(_session_key(session_token))
         
-        if not session_result.data or len(session_result.data) == 0:
+        if not user_id:
             return None
         
-        session = session_result.data[0]
-        
-        # Get user data
-        if isinstance(session.get("users"), dict):
-            return session["users"]
-        elif isinstance(session.get("users"), list) and len(session["users"]) > 0:
-            return session["users"][0]
-        
-        # Fallback: get user directly
-        user_result = (
-            supabase.table("users")
-            .select("*")
-            .eq("id", session["user_id"])
-            .execute()
-        )
-        
-        return user_result.data[0] if user_result.data else None
+        return _get_user_by_id(user_id)
         
     except Exception as e:
         print(f"Error getting user from session: {e}")
@@ -149,10 +160,8 @@ def delete_session(session_token: str) -> bool:
     Returns:
         True if deleted, False otherwise
     """
-    supabase = get_supabase()
-    
     try:
-        supabase.table("sessions").delete().eq("token", session_token).execute()
+        get_redis().delete(_session_key(session_token))
         return True
     except Exception as e:
         print(f"Error deleting session: {e}")
@@ -1,20 +1,58 @@
 """
-Supabase Database Connection
+Supabase Database and Redis Connections
 """
 
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_TIMEOUT
+import httpx
+import redis
 import os
 
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set")
 
+# Long-lived HTTP/2 connection pool shared by all Supabase requests, so warm
+# connections skip the TCP and TLS handshakes
+http_client = httpx.Client(
+    http2=True,
+    timeout=DEFAULT_POSTGREST_CLIENT_TIMEOUT,
+    limits=httpx.Limits(max_keepalive_connections=50, keepalive_expiry=300),
+)
+
 # Create Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase: Client = create_client(
+    SUPABASE_URL,
+    SUPABASE_KEY,
+    options=ClientOptions(httpx_client=http_client),
+)
+
+# Create Redis client (connects lazily from a shared pool)
+redis_client: redis.Redis = redis.Redis.from_url(REDIS_URL, decode_responses=True)
 
 
 def get_supabase() -> Client:
     """Get Supabase client instance"""
     return supabase
+
+
+def get_redis() -> redis.Redis:
+    """Get Redis client instance"""
+    return redis_client
+
+
+def warm_supabase_connection() -> None:
+    """Open a pooled connection to Supabase ahead of the first request"""
+    try:
+        supabase.table("users").select("id").limit(1).execute()
+    except Exception as e:
+        print(f"Error warming Supabase connection: {e}")
+
+
+def close_connections() -> None:
+    """Close pooled Supabase and Redis connections"""
+    http_client.close()
+    redis_client.close()
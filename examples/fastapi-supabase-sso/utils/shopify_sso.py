@@ -3,19 +3,108 @@ Shopify SSO Token Validation Utility
 Validates and decrypts SSO tokens from Shopify
 """
 
-import json
 import base64
 import hmac
 import hashlib
-from datetime import datetime
-from typing import Optional, Dict
+import threading
+import time
+from datetime import timezone
+from functools import lru_cache
+from typing import Optional, Dict, Tuple
+import ciso8601
+import orjson
+from cachetools import TTLCache
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.backends.openssl.backend import backend as openssl_backend
 import os
 
 SHOPIFY_SSO_SECRET = os.getenv("SHOPIFY_SSO_SECRET", "")
 TOKEN_EXPIRY_MINUTES = 15
+_TOKEN_EXPIRY_SECONDS = TOKEN_EXPIRY_MINUTES * 60
+
+# Token layout: IV (16 bytes) + AES-CBC ciphertext (>= 1 block) + HMAC-SHA256 (32 bytes)
+_AES_BLOCK_SIZE = 16
+_SIGNATURE_SIZE = 32
+_MIN_TOKEN_SIZE = 2 * _AES_BLOCK_SIZE + _SIGNATURE_SIZE
+
+# Recently rejected tokens, so replayed bad tokens are refused before any
+# crypto. Overlong tokens are not remembered to bound the cache's memory.
+_REJECTED_TOKEN_MAX_LENGTH = 2048
+_rejected_tokens: TTLCache = TTLCache(maxsize=4096, ttl=300)
+_rejected_tokens_lock = threading.Lock()
+
+# AES-NI capability bit (CPUID.1:ECX bit 25) in OpenSSL's OPENSSL_ia32cap vector
+_AES_NI_CAPABILITY_BIT = 1 << 57
+
+
+def _aes_ni_disabled_by_env() -> bool:
+    """Check whether OPENSSL_ia32cap masks out AES-NI for this process"""
+    capability = os.getenv("OPENSSL_ia32cap", "").split(":")[0].strip()
+    if not capability:
+        return False
+
+    try:
+        if capability.startswith("~"):
+            return bool(int(capability[1:], 0) & _AES_NI_CAPABILITY_BIT)
+        return not int(capability, 0) & _AES_NI_CAPABILITY_BIT
+    except ValueError:
+        return False
+
+
+def check_aes_ni_support() -> bool:
+    """
+    Log the OpenSSL build used for SSO decryption and check AES-NI
+
+    OpenSSL picks AES-NI automatically when the CPU supports it, unless
+    the OPENSSL_ia32cap environment variable masks the capability out.
+
+    Returns:
+        False if AES-NI has been disabled through the environment, True otherwise
+    """
+    print(f"SSO token decryption using {openssl_backend.openssl_version_text()}")
+
+    if _aes_ni_disabled_by_env():
+        print(
+            "WARNING: OPENSSL_ia32cap disables AES-NI; SSO token decryption "
+            "will fall back to software AES"
+        )
+        return False
+
+    return True
+
+
+@lru_cache(maxsize=1)
+def _derive_keys(secret: str) -> Tuple[bytes, bytes]:
+    """
+    Derive the encryption and signature keys from the SSO secret
+
+    The secret is constant for the lifetime of the process, so the
+    derivation runs once per secret instead of once per token.
+
+    Returns:
+        Tuple of (encryption_key, signature_key)
+    """
+    key_material = hashlib.sha256(secret.encode()).digest()
+    return key_material[:16], key_material[16:32]
+
+
+@lru_cache(maxsize=1)
+def _signature_hmac(secret: str) -> hmac.HMAC:
+    """
+    Get a keyed HMAC-SHA256 template for the signature key
+
+    Callers must ``.copy()`` the template before updating it; the copy
+    keeps the keyed inner/outer state so the key setup is not repeated.
+    """
+    _, signature_key = _derive_keys(secret)
+    return hmac.new(signature_key, None, hashlib.sha256)
+
+
+@lru_cache(maxsize=1)
+def _encryption_algorithm(secret: str) -> algorithms.AES:
+    """Get the AES algorithm object for the encryption key"""
+    encryption_key, _ = _derive_keys(secret)
+    return algorithms.AES(encryption_key)
 
 
 def validate_shopify_sso_token(token: str) -> Optional[Dict]:
@@ -31,54 +120,77 @@ def validate_shopify_sso_token(token: str) -> Optional[Dict]:
     if not SHOPIFY_SSO_SECRET:
         raise ValueError("SHOPIFY_SSO_SECRET environment variable is required")
 
-    try:
-        # Decode base64
-        token_data = base64.urlsafe_b64decode(token)
+    with _rejected_tokens_lock:
+        if token in _rejected_tokens:
+            return None
+
+    customer_data = _decrypt_sso_token(token)
+
+    if customer_data is None and len(token) <= _REJECTED_TOKEN_MAX_LENGTH:
+        with _rejected_tokens_lock:
+            _rejected_tokens[token] = True
+
+    return customer_data
+
 
-        # Derive keys from secret
-        key_material = hashlib.sha256(SHOPIFY_SSO_SECRET.encode()).digest()
-        encryption_key = key_material[:16]
-        signature_key = key_material[16:32]
+def _decrypt_sso_token(token: str) -> Optional[Dict]:
+    """Verify, decrypt and expiry-check an SSO token; None if it is invalid"""
+    try:
+        # Decode base64; slice through a memoryview so the signature, IV and
+        # ciphertext are passed to the crypto primitives without copies
+        token_data = memoryview(base64.urlsafe_b64decode(token))
+
+        # Reject malformed tokens before any crypto; this also guarantees the
+        # signature comparison below always runs on two 32-byte digests
+        if (
+            len(token_data) < _MIN_TOKEN_SIZE
+            or (len(token_data) - _SIGNATURE_SIZE) % _AES_BLOCK_SIZE
+        ):
+            return None
 
         # Extract signature (last 32 bytes) and encrypted data
-        signature = token_data[-32:]
-        encrypted_data = token_data[:-32]
+        signature = token_data[-_SIGNATURE_SIZE:]
+        encrypted_data = token_data[:-_SIGNATURE_SIZE]
 
-        # Verify signature
-        expected_signature = hmac.new(
-            signature_key, encrypted_data, hashlib.sha256
-        ).digest()
+        # Verify signature before touching AES, so forged or scanned tokens
+        # are rejected without any decryption work
+        mac = _signature_hmac(SHOPIFY_SSO_SECRET).copy()
+        mac.update(encrypted_data)
+        expected_signature = mac.digest()
 
         if not hmac.compare_digest(signature, expected_signature):
             return None
 
         # Extract IV (first 16 bytes) and ciphertext
-        iv = encrypted_data[:16]
-        ciphertext = encrypted_data[16:]
+        iv = encrypted_data[:_AES_BLOCK_SIZE]
+        ciphertext = encrypted_data[_AES_BLOCK_SIZE:]
 
         # Decrypt
-        cipher = Cipher(
-            algorithms.AES(encryption_key), modes.CBC(iv), backend=default_backend()
-        )
+        cipher = Cipher(_encryption_algorithm(SHOPIFY_SSO_SECRET), modes.CBC(iv))
         decryptor = cipher.decryptor()
-        plaintext = decryptor.update(ciphertext) + decryptor.final()
-
-        # Remove PKCS7 padding
-        unpadder = padding.PKCS7(128).unpadder()
-        plaintext = unpadder.update(plaintext) + unpadder.final()
+        plaintext = decryptor.update(ciphertext) + decryptor.finalize()
+
+        # Remove PKCS7 padding: the last byte gives the pad length, and every
+        # pad byte must equal it (compared in constant time)
+        pad_length = plaintext[-1]
+        if not 1 <= pad_length <= _AES_BLOCK_SIZE or not hmac.compare_digest(
+            plaintext[-pad_length:], bytes((pad_length,)) * pad_length
+        ):
+            return None
+        plaintext = plaintext[:-pad_length]
 
-        customer_data = json.loads(plaintext.decode("utf-8"))
+        customer_data = orjson.loads(plaintext)
 
         # Check expiry - handle both "createdAt" and "created_at" for compatibility
         created_at_str = customer_data.get("createdAt") or customer_data.get("created_at")
         if not created_at_str:
             return None
             
-        created_at = datetime.fromisoformat(created_at_str.replace('Z', '+00:00'))
-        now = datetime.utcnow().replace(tzinfo=created_at.tzinfo)
-        diff_minutes = (now - created_at).total_seconds() / 60
+        created_at = ciso8601.parse_datetime(created_at_str)
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
 
-        if diff_minutes > TOKEN_EXPIRY_MINUTES:
+        if created_at.timestamp() + _TOKEN_EXPIRY_SECONDS < time.time():
             return None
 
         return customer_data